@@ -1,15 +1,18 @@
 import streamlit as st
 import pandas as pd
 from datetime import datetime, timedelta
+import functools
 import hashlib
 import time
 import os
 import sys
 import random
+import shutil
 import sqlite3
-import plotly.express as px
 import threading
 import pytz
+import streamlit.components.v1 as components
+from typing import NamedTuple
 
 # --- Configuração de Caminhos (Robusto para Script e Executável) ---
 if getattr(sys, 'frozen', False):
@@ -28,13 +31,50 @@ st.set_page_config(page_title="Controle de Drone Web", page_icon=CAMINHO_IMG, la
 # --- Constantes e Arquivos ---
 DB_FILE = os.path.join(application_path, "app_data.db")
 
-LISTA_RONDAS = [
+# Versão do esquema gravada em PRAGMA user_version; incremente ao mudar o DDL
+# para que bancos existentes rodem a migração uma única vez
+DB_SCHEMA_VERSION = 2
+
+# Tupla (imutável e hashável): o Streamlit não re-hasheia as opções a cada rerun
+LISTA_RONDAS = (
     "Ronda Perímetro 01",
     "Ronda Estacionamento 02",
     "Ronda Talude 03",
     "Ronda Talude 05",
-    
-]
+)
+
+class Registro(NamedTuple):
+    """Uma linha de registro na ordem exata das colunas visíveis da tabela.
+
+    Tupla nomeada em vez de dicionário: acesso por atributo, sem hashing de
+    chaves, e o SQLite faz o bind posicional da tupla diretamente no INSERT.
+    """
+    Voo: str
+    Ronda_N: int
+    Ronda: str
+    Inicio: str
+    Fim: str
+    Duracao_Formatada: str
+    Status: str
+    Data: str
+    Operador: str
+
+# Valores iniciais do st.session_state, aplicados uma única vez em main()
+_DEFAULTS = {
+    'logged_in': False,
+    'voo_ativo': False,
+    'numero_voo_atual': None,
+    'numero_voo_atual_str': None,
+    'contador_rondas_voo': 0,
+    'ronda_ativa': False,
+    'inicio_ronda': None,
+    'inicio_ronda_mono': None,
+    'ronda_selecionada': None,
+    'evento_ativo': False,
+    'inicio_evento': None,
+    'inicio_evento_mono': None,
+    'tipo_evento_atual': None,
+}
 
 # --- Controle de Concorrência ---
 # RLock permite que a mesma thread adquira o bloqueio várias vezes (ex: salvar chama carregar)
@@ -44,39 +84,145 @@ DATA_LOCK = threading.RLock()
 FUSO_BR = pytz.timezone('America/Sao_Paulo')
 
 # --- SQLite Functions ---
-def get_db_connection():
-    """Cria e retorna uma conexão com o banco de dados SQLite."""
-    conn = sqlite3.connect(DB_FILE)
+@st.cache_resource(show_spinner=False)
+def _get_conn():
+    """Conexão única e de longa duração com o SQLite (cacheada pelo Streamlit).
+
+    Abrir/fechar uma conexão a cada chamada refaz os PRAGMAs e o handshake
+    com os arquivos DB/WAL/SHM em todo rerun. check_same_thread=False é
+    seguro aqui porque todas as escritas são serializadas pelo DATA_LOCK.
+    """
+    conn = sqlite3.connect(DB_FILE, check_same_thread=False)
     conn.row_factory = sqlite3.Row # Permite acessar colunas por nome
+    # Otimização: WAL evita um fsync por commit (o gargalo é o disco, não a CPU)
+    # e synchronous=NORMAL é seguro em WAL. Cache de página maior (64 MB) e
+    # tabelas temporárias em memória aceleram leituras do dashboard e importações.
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA temp_store=MEMORY")
+    conn.execute("PRAGMA cache_size=-65536")
     return conn
 
+def get_db_connection():
+    """Retorna a conexão cacheada com o banco de dados SQLite."""
+    return _get_conn()
+
+def _db_mtime():
+    """mtime efetivo do banco (considera o -wal, onde os commits chegam primeiro).
+
+    Serve de chave de cache: arquivo inalterado = cache hit; qualquer escrita
+    muda o mtime e invalida sozinha, sem TTL nem clear manual.
+    """
+    mtime = os.path.getmtime(DB_FILE)
+    try:
+        mtime = max(mtime, os.path.getmtime(DB_FILE + "-wal"))
+    except OSError:
+        pass
+    return mtime
+
+@functools.lru_cache(maxsize=256)
 def hash_senha(senha):
-    """Cria um hash SHA256 para a senha fornecida."""
+    """Cria um hash SHA256 para a senha fornecida.
+
+    Função pura com salt fixo, então o lru_cache apenas memoiza entradas
+    idênticas no processo (ex: admin redigitando a senha para backup e
+    limpeza na mesma sessão) sem alterar o resultado.
+    """
     # Adiciona um 'salt' fixo para aumentar a segurança contra tabelas pré-computadas
-    salt = "drone_security_v1_" 
+    salt = "drone_security_v1_"
     return hashlib.sha256((salt + senha).encode()).hexdigest()
 
 
+# Colunas da tabela principal, compartilhadas entre init_db e a troca por
+# tabela de staging da importação "Substituir Base Completa"
+_SQL_COLUNAS_REGISTROS = """
+    Voo TEXT,
+    Ronda_N INTEGER,
+    Ronda TEXT,
+    Inicio TEXT,
+    Fim TEXT,
+    Duracao_Formatada TEXT,
+    Status TEXT,
+    Data TEXT,
+    Operador TEXT,
+    Data_iso TEXT,
+    Inicio_ts INTEGER,
+    is_evento INTEGER,
+    Duracao_Min REAL
+"""
+
+def _criar_indices_registros(cursor):
+    """(Re)cria os índices de registros usados pelos filtros do dashboard."""
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_registros_data ON registros(Data)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_registros_operador ON registros(Operador)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_registros_ronda ON registros(Ronda)")
+
+def _backfill_colunas_derivadas(cursor):
+    """Preenche Data_iso/Inicio_ts em linhas antigas ou importadas de CSV.
+
+    Armazenar a data em ISO-8601 e o início como epoch evita que o dashboard
+    pague um pd.to_datetime com formato 'dd/mm/aaaa' sobre o histórico inteiro
+    a cada render — reescrevemos o dado uma vez, no banco.
+    """
+    cursor.execute("""
+        UPDATE registros
+        SET Data_iso = substr(Data, 7, 4) || '-' || substr(Data, 4, 2) || '-' || substr(Data, 1, 2)
+        WHERE Data_iso IS NULL AND length(Data) = 10
+    """)
+    # strftime devolve NULL para horários inválidos (ex: '--:--:--'),
+    # então essas linhas simplesmente continuam sem Inicio_ts (como o
+    # errors='coerce' antigo)
+    cursor.execute("""
+        UPDATE registros
+        SET Inicio_ts = strftime('%s', Data_iso || 'T' || Inicio)
+        WHERE Inicio_ts IS NULL AND Data_iso IS NOT NULL
+    """)
+    cursor.execute("""
+        UPDATE registros
+        SET is_evento = CASE WHEN Ronda LIKE '%EVENTO%' THEN 1 ELSE 0 END
+        WHERE is_evento IS NULL
+    """)
+    # Duração em Python, dividindo pelo ':' — CSVs importados (Excel) usam
+    # H:MM:SS sem zero à esquerda, onde um substr de posição fixa erraria
+    pendentes = cursor.execute("""
+        SELECT rowid, Duracao_Formatada FROM registros
+        WHERE Duracao_Min IS NULL AND Duracao_Formatada IS NOT NULL
+    """).fetchall()
+    atualizacoes = []
+    for linha in pendentes:
+        try:
+            h, m, s = str(linha[1]).split(':')
+            atualizacoes.append((int(h) * 60 + int(m) + int(s) / 60.0, linha[0]))
+        except ValueError:
+            pass # Formatos inesperados continuam sem Duracao_Min
+    if atualizacoes:
+        cursor.executemany("UPDATE registros SET Duracao_Min = ? WHERE rowid = ?", atualizacoes)
+
 def init_db():
     """Inicializa o banco de dados, criando tabelas se não existirem."""
     with DATA_LOCK:
         conn = get_db_connection()
+        # Banco já inicializado/migrado: pula todo o DDL + seed, que rodava
+        # (segurando o DATA_LOCK) a cada partida do processo
+        if conn.execute("PRAGMA user_version").fetchone()[0] >= DB_SCHEMA_VERSION:
+            return
         cursor = conn.cursor()
         
         # Create 'registros' table
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS registros (
-                Voo TEXT,
-                Ronda_N INTEGER,
-                Ronda TEXT,
-                Inicio TEXT,
-                Fim TEXT,
-                Duracao_Formatada TEXT,
-                Status TEXT,
-                Data TEXT,
-                Operador TEXT
-            )
-        """)
+        cursor.execute(f"CREATE TABLE IF NOT EXISTS registros ({_SQL_COLUNAS_REGISTROS})")
+
+        # Migração: bancos antigos não têm as colunas derivadas
+        cursor.execute("PRAGMA table_info(registros)")
+        colunas_existentes = {row['name'] for row in cursor.fetchall()}
+        if 'Data_iso' not in colunas_existentes:
+            cursor.execute("ALTER TABLE registros ADD COLUMN Data_iso TEXT")
+        if 'Inicio_ts' not in colunas_existentes:
+            cursor.execute("ALTER TABLE registros ADD COLUMN Inicio_ts INTEGER")
+        if 'is_evento' not in colunas_existentes:
+            cursor.execute("ALTER TABLE registros ADD COLUMN is_evento INTEGER")
+        if 'Duracao_Min' not in colunas_existentes:
+            cursor.execute("ALTER TABLE registros ADD COLUMN Duracao_Min REAL")
+        _backfill_colunas_derivadas(cursor)
         
         # Create 'usuarios' table
         cursor.execute("""
@@ -86,78 +232,173 @@ def init_db():
             )
         """)
         
+        # Índices para os filtros/agrupamentos do dashboard (Data/Operador/Ronda)
+        # e para a busca de login case-insensitive — sem eles o SQLite varre a
+        # tabela inteira a cada interação com os filtros
+        _criar_indices_registros(cursor)
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_usuarios_lower ON usuarios(lower(usuario))")
+
         # Insert default admin user if 'usuarios' table is empty
         cursor.execute("SELECT COUNT(*) FROM usuarios")
         if cursor.fetchone()[0] == 0:
             admin_senha_hash = hash_senha("123456")
             cursor.execute("INSERT INTO usuarios (usuario, senha) VALUES (?, ?)", ("admin", admin_senha_hash))
-        
+
+        cursor.execute(f"PRAGMA user_version = {DB_SCHEMA_VERSION}")
         conn.commit()
-        conn.close()
 
 # Call init_db once at the start
 init_db()
 
 # --- Funções Auxiliares ---
+# Com pandas >= 2.0 e pyarrow instalado, as colunas de texto vêm como Arrow
+# strings (cerca de metade da memória de 'object', com kernels de str/groupby
+# mais rápidos). Sem pyarrow, cai no backend padrão sem mudar comportamento.
+try:
+    import pyarrow  # noqa: F401
+    _READ_SQL_KWARGS = {"dtype_backend": "pyarrow"} if int(pd.__version__.split('.')[0]) >= 2 else {}
+except ImportError:
+    _READ_SQL_KWARGS = {}
+
+COLUNAS_REGISTROS = ["Voo", "Ronda_N", "Ronda", "Inicio", "Fim", "Duracao_Formatada", "Status", "Data", "Operador", "Data_iso", "Inicio_ts", "is_evento", "Duracao_Min"]
+
+# Colunas exibidas nas tabelas da interface (sem as derivadas internas)
+COLS_UI = ("Voo", "Ronda_N", "Ronda", "Inicio", "Fim", "Duracao_Formatada", "Status", "Data", "Operador")
+
+@st.cache_data(show_spinner=False, max_entries=1)
+def _carregar_dados_cached(mtime):
+    # Chaveado no mtime efetivo do banco: o loop de rerun do Painel (que lê
+    # os dados várias vezes por segundo com o cronômetro ativo) reusa o
+    # DataFrame em memória e qualquer escrita invalida na hora.
+    # max_entries=1: cada escrita gera um mtime novo e só o atual interessa —
+    # sem o limite, um DataFrame do histórico inteiro ficaria retido por ronda
+    with DATA_LOCK:
+        conn = get_db_connection()
+        df = pd.read_sql_query("SELECT * FROM registros", conn, **_READ_SQL_KWARGS)
+    # Ensure all expected columns are present, adding if missing
+    for col in COLUNAS_REGISTROS:
+        if col not in df.columns:
+            df[col] = None
+    # Tipos enxutos já na carga: groupby/value_counts em qualquer tela passam
+    # a usar códigos inteiros em vez de hashear strings Python por linha
+    for col in ('Status', 'Ronda', 'Operador', 'Voo', 'Data'):
+        df[col] = df[col].astype('category')
+    df['Ronda_N'] = pd.to_numeric(df['Ronda_N'], downcast='integer', errors='coerce')
+    return df
+
 def carregar_dados(raise_on_error=False):
+    try:
+        return _carregar_dados_cached(_db_mtime())
+    except pd.io.sql.DatabaseError as e:
+        msg_erro = f"Erro crítico ao carregar dados do banco: {e}"
+        if raise_on_error:
+            raise Exception(msg_erro) from e
+        st.error(msg_erro)
+        return pd.DataFrame(columns=COLUNAS_REGISTROS)
+
+@st.cache_data(show_spinner=False, max_entries=1)
+def carregar_ultimos(mtime, n=10):
+    """Últimos n registros (mais recentes primeiro) direto do banco.
+
+    LIMIT empurrado para o SQLite: custo constante, em vez de carregar o
+    histórico inteiro para mostrar as 10 últimas linhas. Só as colunas
+    visíveis — as derivadas internas não aparecem na tabela.
+    """
     with DATA_LOCK:
-        colunas_esperadas = ["Voo", "Ronda_N", "Ronda", "Inicio", "Fim", "Duracao_Formatada", "Status", "Data", "Operador"]
-        try:
-            conn = get_db_connection()
-            df = pd.read_sql_query("SELECT * FROM registros", conn)
-            # Ensure all expected columns are present, adding if missing
-            for col in colunas_esperadas:
-                if col not in df.columns:
-                    df[col] = None
-            return df
-        except pd.io.sql.DatabaseError as e:
-            msg_erro = f"Erro crítico ao carregar dados do banco: {e}"
-            if raise_on_error:
-                raise Exception(msg_erro) from e
-            st.error(msg_erro)
-            df = pd.DataFrame(columns=colunas_esperadas)
-            return df
-        finally:
-            conn.close()
+        conn = get_db_connection()
+        return pd.read_sql_query(
+            f"SELECT {', '.join(COLS_UI)} FROM registros ORDER BY rowid DESC LIMIT ?",
+            conn, params=(n,), **_READ_SQL_KWARGS
+        )
 
 # --- Cache para o Dashboard ---
 # Isso evita ler o disco a cada clique nos filtros, melhorando muito a velocidade
-@st.cache_data(ttl=60)  # Cache válido por 60 segundos
-def carregar_dados_dashboard():
+@st.cache_data(show_spinner=False, max_entries=1)
+def carregar_dados_dashboard(mtime):
+    # 'mtime' (de _db_mtime) é só a chave do cache: hit enquanto o banco não
+    # muda, refresh imediato assim que qualquer escrita acontece
     return carregar_dados()
 
-def salvar_registro(novo_dado):
+@st.cache_data(show_spinner=False, max_entries=16)
+def calcular_kpis(anos_sel, ops_sel, mtime):
+    """Calcula os KPIs do dashboard direto no SQLite.
+
+    A agregação roda dentro do banco numa única varredura, sem materializar
+    um objeto Python por linha — o custo não cresce com o histórico no lado
+    do pandas. Os filtros da sidebar viram cláusulas WHERE parametrizadas.
+    """
+    where = []
+    params = []
+    if anos_sel:
+        where.append("CAST(substr(Data, 7, 4) AS INTEGER) IN (%s)" % ",".join("?" * len(anos_sel)))
+        params.extend(int(a) for a in anos_sel)
+    if ops_sel:
+        where.append("Operador IN (%s)" % ",".join("?" * len(ops_sel)))
+        params.extend(ops_sel)
+    clausula = (" WHERE " + " AND ".join(where)) if where else ""
+    with DATA_LOCK:
+        conn = get_db_connection()
+        row = conn.execute(f"""
+            SELECT COUNT(DISTINCT CAST(Voo AS INTEGER)) AS total_voos,
+                   SUM(CASE WHEN COALESCE(is_evento, 0) = 0 THEN 1 ELSE 0 END) AS total_rondas,
+                   SUM(Duracao_Min) AS tempo_total_min,
+                   AVG(CASE WHEN Status = 'Concluído' AND COALESCE(is_evento, 0) = 0
+                            THEN Duracao_Min END) AS media_ronda
+            FROM registros{clausula}
+        """, params).fetchone()
+    return (
+        row['total_voos'] or 0,
+        row['total_rondas'] or 0,
+        row['tempo_total_min'] or 0.0,
+        row['media_ronda'] or 0.0,
+    )
+
+def salvar_registro(reg: Registro):
     with DATA_LOCK:
         conn = get_db_connection()
-        cursor = conn.cursor()
         try:
-            # Converte o dicionário para uma tupla para inserção, garantindo a ordem correta
-            data_tuple = (
-                novo_dado.get("Voo"),
-                novo_dado.get("Ronda_N"),
-                novo_dado.get("Ronda"),
-                novo_dado.get("Inicio"),
-                novo_dado.get("Fim"),
-                novo_dado.get("Duracao_Formatada"),
-                novo_dado.get("Status"),
-                novo_dado.get("Data"),
-                novo_dado.get("Operador")
-            )
-            cursor.execute("""
-                INSERT INTO registros (Voo, Ronda_N, Ronda, Inicio, Fim, Duracao_Formatada, Status, Data, Operador)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """, data_tuple)
+            # Deriva as colunas rápidas de data/hora uma única vez, na escrita.
+            # O epoch usa a convenção "hora de parede como UTC", a mesma do
+            # strftime('%s') do backfill, para a extração de hora ser estável.
+            data_iso = f"{reg.Data[6:10]}-{reg.Data[3:5]}-{reg.Data[0:2]}" if len(reg.Data) == 10 else None
+            inicio_ts = None
+            if data_iso:
+                try:
+                    dt = datetime.strptime(f"{reg.Data} {reg.Inicio}", "%d/%m/%Y %H:%M:%S")
+                    inicio_ts = int(dt.replace(tzinfo=pytz.utc).timestamp())
+                except ValueError:
+                    pass # Justificativas usam '--:--:--' e ficam sem epoch
+            is_evento = int("EVENTO" in reg.Ronda)
+            try:
+                h, m, s = reg.Duracao_Formatada.split(':')
+                duracao_min = int(h) * 60 + int(m) + int(s) / 60.0
+            except (AttributeError, ValueError):
+                duracao_min = None
+
+            # A tupla nomeada já está na ordem das colunas; só anexamos as derivadas
+            conn.execute("""
+                INSERT INTO registros (Voo, Ronda_N, Ronda, Inicio, Fim, Duracao_Formatada, Status, Data, Operador, Data_iso, Inicio_ts, is_evento, Duracao_Min)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """, (*reg, data_iso, inicio_ts, is_evento, duracao_min))
             conn.commit()
-            carregar_dados_dashboard.clear() # Limpa o cache para refletir o novo dado
         except sqlite3.Error as e:
             st.error(f"Erro ao salvar registro no banco de dados: {e}")
-        finally:
-            conn.close()
+
+def _proximo_voo_num():
+    """Próximo número de voo via MAX agregado no SQLite.
+
+    Substitui o carregamento do histórico inteiro + pd.to_numeric por uma
+    agregação O(1) no banco a cada clique em 'Iniciar Novo Voo'.
+    """
+    with DATA_LOCK:
+        conn = get_db_connection()
+        row = conn.execute("SELECT MAX(CAST(Voo AS INTEGER)) FROM registros").fetchone()
+    return (row[0] or 0) + 1
 
 def formatar_duracao(segundos):
-    m, s = divmod(segundos, 60)
+    m, s = divmod(int(segundos), 60)
     h, m = divmod(m, 60)
-    return f"{int(h):02d}:{int(m):02d}:{int(s):02d}"
+    return f"{h:02d}:{m:02d}:{s:02d}"
 
 def safe_rerun():
     """Função auxiliar para compatibilidade entre versões do Streamlit"""
@@ -179,6 +420,44 @@ def verificar_senha(senha_fornecida, senha_hash_armazenada):
     """Verifica se a senha fornecida corresponde ao hash armazenado."""
     return hash_senha(senha_fornecida) == senha_hash_armazenada
 
+def _buscar_usuario(nome):
+    """Busca um usuário pelo nome (case-insensitive) direto no banco.
+
+    Uma consulta pontual (que usa o índice em lower(usuario)) em vez de
+    carregar a tabela inteira num DataFrame a cada login. O lower() do
+    SQLite só cobre ASCII, então nomes acentuados (ex: 'JOÃO') caem num
+    fallback em Python com casefold sobre a tabela de usuários.
+    """
+    nome = nome.strip()
+    with DATA_LOCK:
+        conn = get_db_connection()
+        row = conn.execute(
+            "SELECT usuario, senha FROM usuarios WHERE lower(usuario) = ? LIMIT 1",
+            (nome.lower(),)
+        ).fetchone()
+        if row is not None:
+            return row
+        alvo = nome.casefold()
+        for row in conn.execute("SELECT usuario, senha FROM usuarios"):
+            if str(row['usuario']).casefold() == alvo:
+                return row
+    return None
+
+def get_user_hash(nome):
+    """Retorna o hash de senha do usuário, ou None se não existir."""
+    row = _buscar_usuario(nome)
+    return row['senha'] if row else None
+
+@st.cache_data(ttl=10, show_spinner=False)
+def _admin_hash():
+    """Hash da senha do admin, cacheado por alguns segundos.
+
+    As verificações de admin (cadastro, backup, limpeza) costumam acontecer
+    em sequência na mesma sessão; o TTL curto evita repetir a consulta sem
+    segurar um hash obsoleto por muito tempo.
+    """
+    return get_user_hash('admin')
+
 def carregar_usuarios():
     """Carrega os usuários do banco de dados."""
     with DATA_LOCK:
@@ -189,8 +468,6 @@ def carregar_usuarios():
         except pd.io.sql.DatabaseError as e:
             st.error(f"Erro ao carregar usuários do banco de dados: {e}")
             return pd.DataFrame(columns=["usuario", "senha"])
-        finally:
-            conn.close()
 
 def salvar_usuario(usuario, senha):
     """Salva um novo usuário no banco de dados, verificando se já existe."""
@@ -200,57 +477,63 @@ def salvar_usuario(usuario, senha):
         try:
             cursor.execute("INSERT INTO usuarios (usuario, senha) VALUES (?, ?)", (usuario, hash_senha(senha)))
             conn.commit()
+            _admin_hash.clear() # Caso a linha do admin tenha mudado
             return True
         except sqlite3.IntegrityError: # Handles UNIQUE constraint violation
             return False  # Usuário já existe
         except sqlite3.Error as e:
             st.error(f"Erro ao salvar usuário no banco de dados: {e}")
             return False
-        finally:
-            conn.close()
-
-# --- Componente de Cronômetro (Fragmento) ---
-if hasattr(st, "fragment"):
-    @st.fragment(run_every=1)
-    def exibir_cronometro_ativo():
-        inicio = st.session_state.get('inicio_ronda')
-        if inicio:
-            try:
-                agora = datetime.now(FUSO_BR)
-                delta_segundos = (agora - inicio).total_seconds()
-                st.metric(label="Tempo da Ronda", value=formatar_duracao(delta_segundos))
-            except Exception: pass
-
-    @st.fragment
-    def exibir_cronometro_estatico():
-        agora = datetime.now(FUSO_BR)
-        delta_segundos = (agora - st.session_state['inicio_ronda']).total_seconds()
-        st.metric(label="Tempo da Ronda", value=formatar_duracao(delta_segundos))
-        if st.button("🔄 Atualizar Manualmente"):
-            st.rerun()
-
-    @st.fragment(run_every=1)
-    def exibir_cronometro_evento():
-        inicio = st.session_state.get('inicio_evento')
-        if inicio:
-            try:
-                agora = datetime.now(FUSO_BR)
-                delta_segundos = (agora - inicio).total_seconds()
-                st.metric(label="Duração do Evento", value=formatar_duracao(delta_segundos))
-            except Exception: pass
+
+# --- Componente de Cronômetro ---
+# A contagem automática roda inteiramente no navegador: o servidor renderiza
+# o tempo já decorrido uma única vez e um setInterval em JS atualiza o texto
+# a cada segundo. Nenhum rerun (nem de fragment) acontece até o usuário
+# clicar em Finalizar. O deslocamento inicial vem de time.monotonic() do
+# servidor, então o relógio do navegador não precisa estar sincronizado.
+def exibir_cronometro_js(segundos_iniciais, rotulo):
+    d0 = int(segundos_iniciais)
+    components.html(
+        f"""
+        <div style="font-family: 'Source Sans Pro', sans-serif;">
+          <span style="font-size: 0.85rem; color: #808495;">{rotulo}</span><br>
+          <span id="t" style="font-size: 2.1rem; color: #31333f;"></span>
+        </div>
+        <script>
+          const off = {d0};
+          const t0 = Date.now();
+          function tick() {{
+            const d = off + Math.floor((Date.now() - t0) / 1000);
+            const h = Math.floor(d / 3600);
+            const m = Math.floor((d % 3600) / 60);
+            const s = d % 60;
+            document.getElementById('t').textContent =
+              String(h).padStart(2, '0') + ':' + String(m).padStart(2, '0') + ':' + String(s).padStart(2, '0');
+          }}
+          tick();
+          setInterval(tick, 1000);
+        </script>
+        """,
+        height=85,
+    )
+
+@st.fragment
+def exibir_cronometro_estatico():
+    delta_segundos = time.monotonic() - st.session_state['inicio_ronda_mono']
+    st.metric(label="Tempo da Ronda", value=formatar_duracao(delta_segundos))
+    if st.button("🔄 Atualizar Manualmente"):
+        st.rerun()
 
 # --- Autenticação Simples ---
 def tentar_login(usuario, senha):
     """Tenta realizar login e retorna True se sucesso."""
-    usuarios_df = carregar_usuarios()
     # Busca o usuário ignorando maiúsculas/minúsculas
-    registro_usuario = usuarios_df[usuarios_df['usuario'].str.lower() == usuario.lower().strip()]
+    registro_usuario = _buscar_usuario(usuario)
 
-    if not registro_usuario.empty:
-        senha_hash_armazenada = registro_usuario.iloc[0]['senha']
-        if verificar_senha(senha, senha_hash_armazenada):
+    if registro_usuario is not None:
+        if verificar_senha(senha, registro_usuario['senha']):
             st.session_state['logged_in'] = True
-            st.session_state['usuario'] = str(registro_usuario.iloc[0]['usuario'])
+            st.session_state['usuario'] = str(registro_usuario['usuario'])
             st.session_state['pedir_backup_inicial'] = True
             show_success_message("Login realizado com sucesso!")
             safe_rerun()
@@ -259,9 +542,6 @@ def tentar_login(usuario, senha):
 
 def check_password():
     """Retorna True se o login for bem sucedido."""
-    if 'logged_in' not in st.session_state:
-        st.session_state['logged_in'] = False
-
     if not st.session_state['logged_in']:
         col1, col2, col3 = st.columns([1,2,1])
         with col2:
@@ -290,10 +570,9 @@ def check_password():
 
                     if register_submitted:
                         if novo_usuario and nova_senha and senha_admin:
-                            usuarios_df = carregar_usuarios()
-                            admin_info = usuarios_df[usuarios_df['usuario'].str.lower() == 'admin']
-                            
-                            if not admin_info.empty and verificar_senha(senha_admin, admin_info.iloc[0]['senha']):
+                            admin_hash = _admin_hash()
+
+                            if admin_hash and verificar_senha(senha_admin, admin_hash):
                                 if salvar_usuario(novo_usuario, nova_senha):
                                     st.success(f"Operador '{novo_usuario}' cadastrado! Já pode fazer login.")
                                 else:
@@ -305,6 +584,20 @@ def check_password():
         return False
     return True
 
+@st.cache_data(show_spinner=False, max_entries=1)
+def _db_bytes(mtime):
+    """Bytes do banco para download, cacheados pelo mtime efetivo do banco.
+
+    Evita reler o .db inteiro do disco a cada rerun só para montar o botão
+    de download; qualquer escrita muda o mtime e invalida o cache sozinha.
+    """
+    with DATA_LOCK:
+        # Garante que commits ainda no -wal entrem no arquivo principal
+        # antes do backup ser lido
+        get_db_connection().execute("PRAGMA wal_checkpoint(FULL)")
+        with open(DB_FILE, "rb") as f:
+            return f.read()
+
 def alerta_backup_inicial():
     """Exibe um alerta e botão de download logo após o login."""
     if st.session_state.get('pedir_backup_inicial'):
@@ -312,16 +605,15 @@ def alerta_backup_inicial():
             st.warning("⚠️ **Backup de Segurança Automático (Sugerido)**")
             st.markdown("Para evitar perda de dados caso o servidor reinicie, **baixe o backup agora**.")
             try:
-                with open(DB_FILE, "rb") as f:
-                    st.download_button(
-                        label="⬇️ BAIXAR BACKUP AGORA (app_data.db)",
-                        data=f,
-                        file_name=f"backup_auto_{datetime.now(FUSO_BR).strftime('%Y%m%d_%H%M')}.db",
-                        mime="application/octet-stream",
-                        use_container_width=True,
-                        type="primary",
-                        on_click=lambda: st.session_state.update({'pedir_backup_inicial': False})
-                    )
+                st.download_button(
+                    label="⬇️ BAIXAR BACKUP AGORA (app_data.db)",
+                    data=_db_bytes(_db_mtime()),
+                    file_name=f"backup_auto_{datetime.now(FUSO_BR).strftime('%Y%m%d_%H%M')}.db",
+                    mime="application/octet-stream",
+                    use_container_width=True,
+                    type="primary",
+                    on_click=lambda: st.session_state.update({'pedir_backup_inicial': False})
+                )
             except Exception:
                 pass
             st.divider()
@@ -341,14 +633,13 @@ def renderizar_area_importacao(expandido=False):
     with col_db1:
         st.markdown("**1. Fazer Backup**")
         try:
-            with open(DB_FILE, "rb") as f:
-                st.download_button(
-                    label="⬇️ Baixar app_data.db",
-                    data=f,
-                    file_name="app_data.db",
-                    mime="application/octet-stream",
-                    use_container_width=True
-                )
+            st.download_button(
+                label="⬇️ Baixar app_data.db",
+                data=_db_bytes(_db_mtime()),
+                file_name="app_data.db",
+                mime="application/octet-stream",
+                use_container_width=True
+            )
         except Exception:
             st.warning("Banco de dados ainda não disponível.")
 
@@ -359,9 +650,28 @@ def renderizar_area_importacao(expandido=False):
             if st.button("⚠️ Confirmar Restauração", type="primary", use_container_width=True):
                 with DATA_LOCK:
                     try:
+                        # Fecha a conexão explicitamente: _get_conn.clear() só
+                        # esquece a entrada do cache e o objeto pode sobreviver
+                        # num ciclo de referências até o próximo GC — com o
+                        # handle antigo aberto, trocar o arquivo gera
+                        # 'disk I/O error' na reconexão
+                        get_db_connection().close()
+                        _get_conn.clear()
+                        # Remove o -wal/-shm do banco antigo ANTES da cópia:
+                        # como o backup também tem cabeçalho WAL, uma abertura
+                        # posterior replicaria os frames antigos por cima do
+                        # arquivo restaurado (restauração silenciosamente perdida)
+                        for sufixo in ("-wal", "-shm"):
+                            try:
+                                os.remove(DB_FILE + sufixo)
+                            except OSError:
+                                pass
+                        uploaded_db.seek(0)
                         with open(DB_FILE, "wb") as f:
-                            f.write(uploaded_db.getbuffer())
-                        carregar_dados_dashboard.clear()
+                            # Cópia em blocos de 1 MiB: memória constante em vez
+                            # de materializar o upload inteiro uma segunda vez
+                            shutil.copyfileobj(uploaded_db, f, length=1024 * 1024)
+                        init_db() # Backups antigos podem precisar de migração
                         st.success("Banco restaurado com sucesso! Recarregando...")
                         time.sleep(1)
                         safe_rerun()
@@ -387,17 +697,21 @@ def renderizar_area_importacao(expandido=False):
                         with DATA_LOCK:
                             conn = get_db_connection()
                             cursor = conn.cursor()
-                            
-                            # Otimização: Prepara os dados e usa executemany para inserção em lote
-                            dados_para_inserir = df_upload[cols_req].values.tolist()
-                            cursor.executemany("""
-                                INSERT INTO registros (Voo, Ronda_N, Ronda, Inicio, Fim, Duracao_Formatada, Status, Data, Operador)
-                                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-                            """, dados_para_inserir)
-                            
+
+                            # Otimização: to_sql com method='multi' emite INSERTs com
+                            # VALUES de várias linhas por comando (menos parses de SQL e
+                            # menos idas Python<->C por linha), num único COMMIT no final.
+                            cursor.execute("PRAGMA synchronous=OFF")
+                            try:
+                                df_upload[cols_req].to_sql(
+                                    'registros', conn, if_exists='append',
+                                    index=False, method='multi', chunksize=1000
+                                )
+                            finally:
+                                cursor.execute("PRAGMA synchronous=NORMAL")
+                            # CSVs não trazem as colunas derivadas de data/hora
+                            _backfill_colunas_derivadas(cursor)
                             conn.commit()
-                            conn.close()
-                            carregar_dados_dashboard.clear()
                         show_success_message("Dados mesclados com sucesso!")
                         safe_rerun()
                         
@@ -405,18 +719,27 @@ def renderizar_area_importacao(expandido=False):
                         with DATA_LOCK:
                             conn = get_db_connection()
                             cursor = conn.cursor()
-                            cursor.execute("DELETE FROM registros") # Clear existing data
-                            
-                            # Otimização: Inserção em lote
-                            dados_para_inserir = df_upload[cols_req].values.tolist()
-                            cursor.executemany("""
-                                INSERT INTO registros (Voo, Ronda_N, Ronda, Inicio, Fim, Duracao_Formatada, Status, Data, Operador)
-                                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-                            """, dados_para_inserir)
-                            
+
+                            # Otimização: carrega numa tabela de staging e troca por
+                            # DROP + RENAME — o DROP é O(1) (sem custo de journal por
+                            # linha apagada) e os índices são reconstruídos uma única
+                            # vez sobre a base nova, depois da carga.
+                            cursor.execute("PRAGMA synchronous=OFF")
+                            try:
+                                cursor.execute("DROP TABLE IF EXISTS registros_new")
+                                cursor.execute(f"CREATE TABLE registros_new ({_SQL_COLUNAS_REGISTROS})")
+                                df_upload[cols_req].to_sql(
+                                    'registros_new', conn, if_exists='append',
+                                    index=False, method='multi', chunksize=1000
+                                )
+                                cursor.execute("DROP TABLE registros")
+                                cursor.execute("ALTER TABLE registros_new RENAME TO registros")
+                                _criar_indices_registros(cursor)
+                            finally:
+                                cursor.execute("PRAGMA synchronous=NORMAL")
+                            # CSVs não trazem as colunas derivadas de data/hora
+                            _backfill_colunas_derivadas(cursor)
                             conn.commit()
-                            conn.close()
-                            carregar_dados_dashboard.clear()
                         show_success_message("Base de dados substituída!")
                         safe_rerun()
                 else:
@@ -435,13 +758,10 @@ def renderizar_area_importacao(expandido=False):
             if not senha_confirmacao:
                 st.warning("Digite a senha de administrador.")
             else:
-                # Verificar senha do admin
-                usuarios_df = carregar_usuarios()
-                # Busca admin de forma segura
-                admin_user = usuarios_df[usuarios_df['usuario'].str.lower() == 'admin']
-                
-                if not admin_user.empty:
-                    senha_hash_admin = admin_user.iloc[0]['senha']
+                # Verificar senha do admin com a consulta pontual cacheada
+                senha_hash_admin = _admin_hash()
+
+                if senha_hash_admin:
                     if verificar_senha(senha_confirmacao, senha_hash_admin):
                         with DATA_LOCK:
                             try:
@@ -449,8 +769,6 @@ def renderizar_area_importacao(expandido=False):
                                 cursor = conn.cursor()
                                 cursor.execute("DELETE FROM registros")
                                 conn.commit()
-                                conn.close()
-                                carregar_dados_dashboard.clear()
                                 show_success_message("Banco de dados limpo com sucesso!")
                                 time.sleep(1)
                                 safe_rerun()
@@ -461,11 +779,103 @@ def renderizar_area_importacao(expandido=False):
                 else:
                     st.error("Erro crítico: Usuário admin não encontrado.")
 
+@st.cache_data(show_spinner=False, max_entries=4)
+def _csv_export(_df, chave):
+    """Serializa o DataFrame filtrado para CSV uma vez por combinação de filtros.
+
+    O _df não entra na chave do cache (prefixo _); 'chave' resume os filtros
+    ativos + mtime do banco, então o rerun do dashboard não re-serializa o
+    frame inteiro só para montar o botão de download.
+    """
+    return _df.to_csv(index=False).encode('utf-8')
+
+# Construir um Figure do Plotly (traces + layout) custa dezenas de ms por
+# gráfico e o resultado é idêntico para as mesmas entradas. Os builders abaixo
+# recebem tuplas (hasheáveis) derivadas das tabelas agregadas e cacheiam a
+# figura pronta por conteúdo.
+@st.cache_resource(show_spinner=False)
+def _fig_pie(nomes, valores, titulo, hole=0.0):
+    import plotly.express as px
+    return px.pie(names=list(nomes), values=list(valores), title=titulo, hole=hole)
+
+@st.cache_resource(show_spinner=False)
+def _fig_bar_media(tipos, medias, titulo):
+    import plotly.express as px
+    return px.bar(x=list(tipos), y=list(medias), text_auto='.1f', title=titulo,
+                  labels={'x': 'Tipo', 'y': 'Media_Min'})
+
+@st.cache_data(show_spinner=False, max_entries=16)
+def _calcular_agregados(_df_filtered, mtime, anos_key, ops_key):
+    """Calcula as tabelas agregadas das abas uma vez por assinatura de filtros.
+
+    O _df_filtered não entra na chave do cache (prefixo _): mtime + filtros
+    já o determinam. Assim, reruns que não mudam filtros (troca de aba,
+    checkbox do cronômetro, etc.) viram um lookup de cache em vez de refazer
+    todos os groupbys sobre o histórico.
+    """
+    evento_mask = _df_filtered['is_evento'].fillna(0).astype(bool)
+    # Uma linha por voo, calculado uma vez e reutilizado por três gráficos
+    unique_voo_df = _df_filtered.drop_duplicates(subset=['Voo'])
+    agg = {}
+
+    # --- Aba 1: evolução temporal ---
+    voos_mes = unique_voo_df.groupby(['Ano', 'Mes_Num'])['Voo'].count().reset_index(name='Qtd')
+    voos_mes['Periodo'] = voos_mes['Mes_Num'].astype(str).str.zfill(2) + '/' + voos_mes['Ano'].astype(str)
+    agg['voos_mes'] = voos_mes
+    agg['voos_dia_especifico'] = _df_filtered.groupby('Data_Dt')['Voo'].nunique().reset_index()
+    agg['voos_dia'] = unique_voo_df.groupby('Dia_Semana')['Voo'].count().reset_index()
+    agg['heatmap'] = _df_filtered.groupby(['Dia_Semana', 'Hora']).size().reset_index(name='Atividades')
+
+    # --- Aba 2: performance por operador ---
+    op_stats = _df_filtered.groupby('Operador', observed=True).agg(
+        Voos=('Voo', 'nunique'),
+        Duracao_Min=('Duracao_Min', 'sum')
+    ).reset_index()
+    agg['voos_op'] = op_stats[['Operador', 'Voos']].sort_values('Voos', ascending=False)
+    horas_op = op_stats[['Operador', 'Duracao_Min']].copy()
+    horas_op['Horas'] = round(horas_op['Duracao_Min'] / 60, 1)
+    agg['horas_op'] = horas_op
+    # Agregada à parte porque usa só o subconjunto sem eventos operacionais
+    agg['eff_df'] = _df_filtered[~evento_mask].groupby('Operador', observed=True).agg(
+        Rondas=('Ronda', 'count'),
+        Media_Min=('Duracao_Min', 'mean')
+    ).reset_index()
+
+    # --- Aba 3: rondas ---
+    rondas_count = _df_filtered[~evento_mask]['Ronda'].value_counts()
+    rondas_count = rondas_count[rondas_count > 0].reset_index()
+    rondas_count.columns = ['Ronda', 'Qtd']
+    agg['rondas_count'] = rondas_count
+    # Simplificar status
+    status_simples = _df_filtered['Status'].apply(lambda x: 'Justificado' if 'Justificado' in x else x)
+    status_count = status_simples.value_counts().reset_index()
+    status_count.columns = ['Status', 'Qtd']
+    agg['status_count'] = status_count
+
+    # --- Aba 4: eventos operacionais ---
+    # Reaproveita a máscara booleana já calculada em vez de comparar a
+    # coluna de strings de novo (mesma semântica: is_evento marca a ronda
+    # "EVENTO OPERACIONAL")
+    eventos_df = _df_filtered[evento_mask]
+    ev_count = eventos_df['Status'].value_counts(sort=False)
+    ev_count = ev_count[ev_count > 0].reset_index()
+    ev_count.columns = ['Tipo', 'Qtd']
+    agg['ev_count'] = ev_count
+    ev_dur = eventos_df.groupby('Status', observed=True)['Duracao_Min'].mean().reset_index()
+    ev_dur.columns = ['Tipo', 'Media_Min']
+    agg['ev_dur'] = ev_dur
+
+    return agg
+
 def renderizar_dashboard():
+    # Import adiado: o plotly leva centenas de ms para carregar e só os
+    # gráficos do dashboard precisam dele — o Painel de Controle não paga o custo
+    import plotly.express as px
+
     st.title("📊 Dashboard de Performance Avançado ")
-    
-    # Usa a função com cache para leitura rápida
-    df = carregar_dados_dashboard()
+
+    # Usa a função com cache para leitura rápida (chaveada pelo mtime do banco)
+    df = carregar_dados_dashboard(_db_mtime())
     
     if df.empty:
         st.warning("Nenhum dado registrado ainda.")
@@ -475,10 +885,11 @@ def renderizar_dashboard():
         return
 
     # --- Pré-processamento de Dados ---
-    # Converter colunas de data e hora
-    df['Data_Dt'] = pd.to_datetime(df['Data'], format="%d/%m/%Y", errors='coerce')
-    # Criar coluna combinada para ordenação e extração
-    df['Inicio_Dt'] = pd.to_datetime(df['Data'] + ' ' + df['Inicio'], format="%d/%m/%Y %H:%M:%S", errors='coerce')
+    # As colunas Data_iso/Inicio_ts são persistidas na escrita (e preenchidas
+    # por _backfill_colunas_derivadas), então a conversão aqui é o caminho
+    # rápido em C do pandas: ISO-8601 e epoch, sem parse de 'dd/mm/aaaa'
+    df['Data_Dt'] = pd.to_datetime(df['Data_iso'], format="%Y-%m-%d", errors='coerce')
+    df['Inicio_Dt'] = pd.to_datetime(df['Inicio_ts'], unit='s', errors='coerce')
     
     # Extrair componentes de tempo
     df['Ano'] = df['Data_Dt'].dt.year
@@ -489,19 +900,21 @@ def renderizar_dashboard():
         'Monday': 'Segunda', 'Tuesday': 'Terça', 'Wednesday': 'Quarta',
         'Thursday': 'Quinta', 'Friday': 'Sexta', 'Saturday': 'Sábado', 'Sunday': 'Domingo'
     }
-    df['Dia_Semana'] = df['Data_Dt'].dt.day_name().map(dias_map)
+    # Categórica ordenada definida UMA vez: todos os groupbys abaixo já saem
+    # na ordem certa, sem reindex/pd.Categorical por aba
+    ordem_dias = ['Segunda', 'Terça', 'Quarta', 'Quinta', 'Sexta', 'Sábado', 'Domingo']
+    df['Dia_Semana'] = pd.Categorical(
+        df['Data_Dt'].dt.day_name().map(dias_map), categories=ordem_dias, ordered=True
+    )
     df['Hora'] = df['Inicio_Dt'].dt.hour
 
-    # Converter duração para minutos
-    def duracao_para_minutos(str_duracao):
-        try:
-            if pd.isna(str_duracao): return 0
-            h, m, s = map(int, str_duracao.split(':'))
-            return h * 60 + m + s / 60
-        except:
-            return 0
-    
-    df['Duracao_Min'] = df['Duracao_Formatada'].apply(duracao_para_minutos)
+    # Duração em minutos já vem persistida do banco (calculada na escrita e
+    # no backfill); nada de parse de string por linha a cada render
+    df['Duracao_Min'] = pd.to_numeric(df['Duracao_Min'], errors='coerce').fillna(0).astype('float32')
+
+    # As colunas do banco já chegam categóricas de _carregar_dados_cached;
+    # só a derivada Mes_Nome precisa da conversão aqui
+    df['Mes_Nome'] = df['Mes_Nome'].astype('category')
 
     # --- Filtros Laterais ---
     st.sidebar.markdown("### 🔍 Filtros do Dashboard")
@@ -525,8 +938,16 @@ def renderizar_dashboard():
         st.warning("Nenhum dado encontrado com os filtros selecionados.")
         return
 
+    # Máscara de eventos (coluna persistida) usada pelo boxplot, que precisa
+    # das linhas individuais; todas as tabelas agregadas saem prontas do
+    # cache por assinatura de filtros
+    evento_mask = df_filtered['is_evento'].fillna(0).astype(bool)
+    agg = _calcular_agregados(df_filtered, _db_mtime(), tuple(anos_sel), tuple(ops_sel))
+
     # Botão de Exportação (Nova Funcionalidade)
-    csv = df_filtered.to_csv(index=False).encode('utf-8')
+    chave_filtros = (tuple(sorted(anos_sel)), tuple(sorted(ops_sel)),
+                     len(df_filtered), _db_mtime())
+    csv = _csv_export(df_filtered, chave_filtros)
     st.download_button(
         label="📥 Baixar Dados (CSV)",
         data=csv,
@@ -536,20 +957,10 @@ def renderizar_dashboard():
 
     # --- KPIs Principais ---
     col1, col2, col3, col4 = st.columns(4)
-    
-    # Voos únicos (considerando que a coluna Voo é o ID)
-    total_voos = pd.to_numeric(df_filtered['Voo'], errors='coerce').nunique()
-    
-    # Rondas (excluindo eventos operacionais)
-    total_rondas = len(df_filtered[~df_filtered['Ronda'].str.contains("EVENTO", na=False)])
-    
-    # Tempo total
-    tempo_total_min = df_filtered['Duracao_Min'].sum()
+
+    # KPIs agregados direto no SQLite (sem passar o histórico pelo pandas)
+    total_voos, total_rondas, tempo_total_min, media_ronda = calcular_kpis(tuple(anos_sel), tuple(ops_sel), _db_mtime())
     horas_totais = int(tempo_total_min // 60)
-    
-    # Média de duração de ronda (apenas concluídas)
-    media_ronda = df_filtered[(df_filtered['Status'] == 'Concluído') & (~df_filtered['Ronda'].str.contains("EVENTO", na=False))]['Duracao_Min'].mean()
-    if pd.isna(media_ronda): media_ronda = 0
 
     col1.metric("Total de Voos", total_voos)
     col2.metric("Rondas Realizadas", total_rondas)
@@ -576,27 +987,19 @@ def renderizar_dashboard():
         c1, c2 = st.columns(2)
         
         with c1:
-            # Voos por Mês (Linha do Tempo)
-            # Agrupar por Ano e Mês para ordenar cronologicamente
-            voos_mes = df_filtered.drop_duplicates(subset=['Voo']).groupby(['Ano', 'Mes_Num'])['Voo'].count().reset_index(name='Qtd')
-            voos_mes['Periodo'] = voos_mes['Mes_Num'].astype(str).str.zfill(2) + '/' + voos_mes['Ano'].astype(str)
-            
-            fig_mes = px.line(voos_mes, x='Periodo', y='Qtd', markers=True, title="Evolução de Voos (Mensal)")
+            # Voos por Mês (Linha do Tempo, já agrupado por Ano/Mês no cache)
+            fig_mes = px.line(agg['voos_mes'], x='Periodo', y='Qtd', markers=True, title="Evolução de Voos (Mensal)")
             st.plotly_chart(fig_mes, width="stretch")
-            
+
             # Tendência Diária (Novo)
             st.markdown("#### Tendência Diária")
-            voos_dia_especifico = df_filtered.groupby('Data_Dt')['Voo'].nunique().reset_index()
-            fig_dia_trend = px.area(voos_dia_especifico, x='Data_Dt', y='Voo', title="Volume Diário de Voos", markers=True)
+            fig_dia_trend = px.area(agg['voos_dia_especifico'], x='Data_Dt', y='Voo', title="Volume Diário de Voos", markers=True)
             fig_dia_trend.update_xaxes(title="Data")
             st.plotly_chart(fig_dia_trend, width="stretch")
             
         with c2:
-            # Voos por Dia da Semana
-            ordem_dias = ['Segunda', 'Terça', 'Quarta', 'Quinta', 'Sexta', 'Sábado', 'Domingo']
-            voos_dia = df_filtered.drop_duplicates(subset=['Voo']).groupby('Dia_Semana')['Voo'].count().reindex(ordem_dias).reset_index()
-            
-            fig_sem = px.bar(voos_dia, x='Dia_Semana', y='Voo', title="Volume de Voos por Dia da Semana", color='Voo')
+            # Voos por Dia da Semana (a categórica ordenada já garante a ordem)
+            fig_sem = px.bar(agg['voos_dia'], x='Dia_Semana', y='Voo', title="Volume de Voos por Dia da Semana", color='Voo')
             st.plotly_chart(fig_sem, width="stretch")
 
         st.divider()
@@ -609,14 +1012,9 @@ def renderizar_dashboard():
         - **Cores:** Áreas mais claras/brilhantes indicam **maior concentração de atividades**. Use isso para identificar gargalos ou horários de pico que exigem mais atenção.
         """)
         
-        # Heatmap
-        heatmap_data = df_filtered.groupby(['Dia_Semana', 'Hora']).size().reset_index(name='Atividades')
-        # Garantir ordem dos dias no heatmap
-        heatmap_data['Dia_Semana'] = pd.Categorical(heatmap_data['Dia_Semana'], categories=ordem_dias, ordered=True)
-        heatmap_data = heatmap_data.sort_values('Dia_Semana')
-        
+        # Heatmap (a categórica ordenada já sai na ordem dos dias)
         fig_heat = px.density_heatmap(
-            heatmap_data, x='Hora', y='Dia_Semana', z='Atividades', 
+            agg['heatmap'], x='Hora', y='Dia_Semana', z='Atividades',
             nbinsx=24, color_continuous_scale='Viridis'
         )
         fig_heat.update_layout(xaxis=dict(dtick=1))
@@ -629,19 +1027,15 @@ def renderizar_dashboard():
         """)
         
         c1, c2 = st.columns(2)
-        
+
         with c1:
             # Total de Voos por Operador
-            voos_op = df_filtered.drop_duplicates(subset=['Voo'])['Operador'].value_counts().reset_index()
-            voos_op.columns = ['Operador', 'Voos']
-            fig_op = px.bar(voos_op, x='Operador', y='Voos', color='Operador', text='Voos', title="Total de Voos por Operador")
+            fig_op = px.bar(agg['voos_op'], x='Operador', y='Voos', color='Operador', text='Voos', title="Total de Voos por Operador")
             st.plotly_chart(fig_op, width="stretch")
-            
+
         with c2:
             # Horas Totais por Operador
-            horas_op = df_filtered.groupby('Operador')['Duracao_Min'].sum().reset_index()
-            horas_op['Horas'] = round(horas_op['Duracao_Min'] / 60, 1)
-            fig_horas = px.bar(horas_op, x='Operador', y='Horas', color='Operador', text='Horas', title="Horas Totais em Operação")
+            fig_horas = px.bar(agg['horas_op'], x='Operador', y='Horas', color='Operador', text='Horas', title="Horas Totais em Operação")
             st.plotly_chart(fig_horas, width="stretch")
             
         st.divider()
@@ -657,12 +1051,7 @@ def renderizar_dashboard():
         """)
 
         # Agrupamento para Scatter Plot
-        eff_df = df_filtered[~df_filtered['Ronda'].str.contains("EVENTO", na=False)].groupby('Operador').agg(
-            Rondas=('Ronda', 'count'),
-            Media_Min=('Duracao_Min', 'mean')
-        ).reset_index()
-        
-        fig_scatter = px.scatter(eff_df, x='Rondas', y='Media_Min', color='Operador', size='Rondas', 
+        fig_scatter = px.scatter(agg['eff_df'], x='Rondas', y='Media_Min', color='Operador', size='Rondas',
                                  text='Operador', title="Relação: Quantidade de Rondas vs Tempo Médio",
                                  labels={'Rondas': 'Total de Rondas Realizadas', 'Media_Min': 'Tempo Médio por Ronda (min)'})
         fig_scatter.update_traces(textposition='top center')
@@ -678,22 +1067,14 @@ def renderizar_dashboard():
         
         with c1:
             # Rondas mais realizadas (excluindo eventos)
-            rondas_df = df_filtered[~df_filtered['Ronda'].str.contains("EVENTO", na=False)]
-            rondas_count = rondas_df['Ronda'].value_counts().reset_index()
-            rondas_count.columns = ['Ronda', 'Qtd']
-            
-            fig_ronda = px.bar(rondas_count, y='Ronda', x='Qtd', orientation='h', title="Rondas Mais Frequentes")
+            fig_ronda = px.bar(agg['rondas_count'], y='Ronda', x='Qtd', orientation='h', title="Rondas Mais Frequentes")
             fig_ronda.update_layout(yaxis={'categoryorder':'total ascending'})
             st.plotly_chart(fig_ronda, width="stretch")
             
         with c2:
-            # Status das Rondas
-            # Simplificar status
-            df_filtered['Status_Simples'] = df_filtered['Status'].apply(lambda x: 'Justificado' if 'Justificado' in x else x)
-            status_count = df_filtered['Status_Simples'].value_counts().reset_index()
-            status_count.columns = ['Status', 'Qtd']
-            
-            fig_status = px.pie(status_count, names='Status', values='Qtd', hole=0.4, title="Taxa de Conclusão vs Justificativas")
+            # Status das Rondas (já simplificados e contados no cache)
+            fig_status = _fig_pie(tuple(agg['status_count']['Status']), tuple(agg['status_count']['Qtd']),
+                                  "Taxa de Conclusão vs Justificativas", hole=0.4)
             st.plotly_chart(fig_status, width="stretch")
             
         st.divider()
@@ -709,7 +1090,7 @@ def renderizar_dashboard():
         """)
 
         # Boxplot para ver distribuição e outliers
-        rondas_validas = df_filtered[(df_filtered['Duracao_Min'] > 0) & (~df_filtered['Ronda'].str.contains("EVENTO", na=False))]
+        rondas_validas = df_filtered[(df_filtered['Duracao_Min'] > 0) & (~evento_mask)]
         fig_box = px.box(rondas_validas, x='Ronda', y='Duracao_Min', color='Ronda', title="Distribuição de Tempo por Tipo de Ronda")
         st.plotly_chart(fig_box, width="stretch")
 
@@ -719,21 +1100,17 @@ def renderizar_dashboard():
         > **Objetivo:** Monitorar o impacto de paradas operacionais (trocas de bateria, refeições) na disponibilidade do drone.
         """)
         
-        eventos_df = df_filtered[df_filtered['Ronda'] == "EVENTO OPERACIONAL"]
-        
-        if not eventos_df.empty:
+        if not agg['ev_count'].empty:
             c1, c2 = st.columns(2)
             with c1:
-                ev_count = eventos_df['Status'].value_counts().reset_index()
-                ev_count.columns = ['Tipo', 'Qtd']
-                fig_ev = px.pie(ev_count, names='Tipo', values='Qtd', title="Distribuição de Eventos")
+                fig_ev = _fig_pie(tuple(agg['ev_count']['Tipo']), tuple(agg['ev_count']['Qtd']),
+                                  "Distribuição de Eventos")
                 st.plotly_chart(fig_ev, width="stretch")
-            
+
             with c2:
                 # Duração média por tipo de evento
-                ev_dur = eventos_df.groupby('Status')['Duracao_Min'].mean().reset_index()
-                ev_dur.columns = ['Tipo', 'Media_Min']
-                fig_ev_dur = px.bar(ev_dur, x='Tipo', y='Media_Min', text_auto='.1f', title="Duração Média (Minutos)")
+                fig_ev_dur = _fig_bar_media(tuple(agg['ev_dur']['Tipo']), tuple(agg['ev_dur']['Media_Min']),
+                                            "Duração Média (Minutos)")
                 st.plotly_chart(fig_ev_dur, width="stretch")
         else:
             st.info("Nenhum evento operacional (bateria/refeição) registrado no período.")
@@ -745,18 +1122,31 @@ def renderizar_dashboard():
 
         st.divider()
         st.subheader("Visualização dos Dados (Filtrados)")
-        st.dataframe(df_filtered)
+        # Envia ao navegador só as colunas visíveis e as 500 linhas mais
+        # recentes — o Arrow serializa a tabela inteira a cada rerun.
+        st.caption(f"Exibindo as últimas 500 de {len(df_filtered)} linhas. Use o download CSV para o conjunto completo.")
+        st.dataframe(df_filtered[list(COLS_UI)].tail(500).iloc[::-1], width="stretch")
+
+@st.cache_resource(show_spinner=False)
+def _sidebar_img_bytes():
+    """Bytes da imagem da sidebar, lidos do disco uma única vez por processo.
+
+    A sidebar é redesenhada a cada rerun (inclusive nos ticks do cronômetro);
+    passar bytes cacheados evita reler e recodificar o arquivo toda vez.
+    O os.path.exists também fica dentro do cache.
+    """
+    caminho = CAMINHO_GIF if os.path.exists(CAMINHO_GIF) else CAMINHO_IMG
+    with open(caminho, "rb") as f:
+        return f.read()
 
 # --- Interface Principal ---
 def main():
-    if 'logged_in' not in st.session_state:
-        st.session_state['logged_in'] = False
+    # Inicialização única do estado da sessão (dicionário central, sem ifs espalhados)
+    for chave, valor in _DEFAULTS.items():
+        st.session_state.setdefault(chave, valor)
 
     # Sidebar (Menu Lateral)
-    if os.path.exists(CAMINHO_GIF):
-        st.sidebar.image(CAMINHO_GIF)
-    else:
-        st.sidebar.image(CAMINHO_IMG)
+    st.sidebar.image(_sidebar_img_bytes())
     
     # Lógica de Exibição do Usuário e Login Rápido
     if st.session_state.get('logged_in', False):
@@ -777,7 +1167,6 @@ def main():
     if st.session_state['logged_in']:
         alerta_backup_inicial()
 
-    if st.session_state['logged_in']:
         if st.sidebar.button("Sair"):
             st.session_state['logged_in'] = False
             st.session_state.pop('usuario', None) # Limpa o usuário da sessão
@@ -786,10 +1175,12 @@ def main():
         if st.sidebar.button("Encerrar Plantão"):
             st.session_state['voo_ativo'] = False
             st.session_state['numero_voo_atual'] = None
+            st.session_state['numero_voo_atual_str'] = None
             st.session_state['contador_rondas_voo'] = 0
             st.session_state['ronda_ativa'] = False
             st.session_state['evento_ativo'] = False
             st.session_state['inicio_evento'] = None
+            st.session_state['inicio_evento_mono'] = None
             safe_rerun()
 
     st.sidebar.markdown("---")
@@ -801,18 +1192,6 @@ def main():
             return
 
         st.title("Painel de Controle de Voos")
-        
-        # Inicializar estados da sessão
-        if 'voo_ativo' not in st.session_state:
-            st.session_state['voo_ativo'] = False
-            st.session_state['numero_voo_atual'] = None
-            st.session_state['contador_rondas_voo'] = 0
-            st.session_state['ronda_ativa'] = False
-            st.session_state['inicio_ronda'] = None
-            st.session_state['ronda_selecionada'] = None
-            st.session_state['evento_ativo'] = False
-            st.session_state['inicio_evento'] = None
-            st.session_state['tipo_evento_atual'] = None
 
         col_esq, col_dir = st.columns([1, 1])
 
@@ -821,23 +1200,20 @@ def main():
             col_v1, col_v2 = st.columns(2)
 
             if col_v1.button("✈️ Iniciar Novo Voo", disabled=st.session_state['voo_ativo'], use_container_width=True, type="primary"):
-                df = carregar_dados(raise_on_error=False) # Leitura segura para UI
-                proximo_voo_num = 1
-                if not df.empty and 'Voo' in df.columns:
-                    # Converte a coluna 'Voo' para números, ignorando o que não for número
-                    voos_numericos = pd.to_numeric(df['Voo'], errors='coerce')
-                    if not voos_numericos.isnull().all():
-                        proximo_voo_num = int(voos_numericos.max()) + 1
+                proximo_voo_num = _proximo_voo_num()
 
                 st.session_state['voo_ativo'] = True
                 st.session_state['numero_voo_atual'] = proximo_voo_num
+                # Formatado uma vez: só muda ao iniciar/finalizar voo
+                st.session_state['numero_voo_atual_str'] = f"{proximo_voo_num:02d}"
                 st.session_state['contador_rondas_voo'] = 0
                 safe_rerun()
 
             if col_v2.button("🛑 Finalizar Voo", disabled=not st.session_state['voo_ativo'] or st.session_state['ronda_ativa'] or st.session_state['evento_ativo'], use_container_width=True):
-                show_success_message(f"Voo {st.session_state['numero_voo_atual']:02d} finalizado com {st.session_state['contador_rondas_voo']} rondas.")
+                show_success_message(f"Voo {st.session_state['numero_voo_atual_str']} finalizado com {st.session_state['contador_rondas_voo']} rondas.")
                 st.session_state['voo_ativo'] = False
                 st.session_state['numero_voo_atual'] = None
+                st.session_state['numero_voo_atual_str'] = None
                 st.session_state['contador_rondas_voo'] = 0
                 safe_rerun()
 
@@ -847,8 +1223,9 @@ def main():
             if st.session_state['voo_ativo']:
                 st.subheader("2. Registro de Ronda")
                 ronda = st.selectbox(
-                    "Selecione a Área de Ronda:", 
-                    LISTA_RONDAS, 
+                    "Selecione a Área de Ronda:",
+                    LISTA_RONDAS,
+                    key='sel_ronda_area',
                     disabled=st.session_state['ronda_ativa'] or st.session_state['evento_ativo']
                 )
 
@@ -857,6 +1234,7 @@ def main():
                 if col_r1.button("🛫 Iniciar Ronda", disabled=st.session_state['ronda_ativa'] or st.session_state['evento_ativo'], use_container_width=True):
                     st.session_state['ronda_ativa'] = True
                     st.session_state['inicio_ronda'] = datetime.now(FUSO_BR)
+                    st.session_state['inicio_ronda_mono'] = time.monotonic()
                     st.session_state['ronda_selecionada'] = ronda
                     safe_rerun()
 
@@ -865,22 +1243,27 @@ def main():
                     inicio = st.session_state['inicio_ronda']
                     duracao_segundos = (fim - inicio).total_seconds()
                     st.session_state['contador_rondas_voo'] += 1
-                    
-                    novo_registro = {
-                        "Voo": f"{st.session_state['numero_voo_atual']:02d}",
-                        "Ronda_N": st.session_state['contador_rondas_voo'],
-                        "Ronda": st.session_state['ronda_selecionada'],
-                        "Inicio": inicio.strftime("%H:%M:%S"),
-                        "Fim": fim.strftime("%H:%M:%S"),
-                        "Duracao_Formatada": formatar_duracao(duracao_segundos),
-                        "Status": "Concluído",
-                        "Data": inicio.strftime("%d/%m/%Y"),
-                        "Operador": st.session_state['usuario']
-                    }
+
+                    # Formata cada datetime uma única vez (strftime re-parseia o formato)
+                    hms_inicio = f"{inicio:%H:%M:%S}"
+                    hms_fim = f"{fim:%H:%M:%S}"
+                    data_dia = f"{inicio:%d/%m/%Y}"
+                    novo_registro = Registro(
+                        Voo=st.session_state['numero_voo_atual_str'],
+                        Ronda_N=st.session_state['contador_rondas_voo'],
+                        Ronda=st.session_state['ronda_selecionada'],
+                        Inicio=hms_inicio,
+                        Fim=hms_fim,
+                        Duracao_Formatada=formatar_duracao(duracao_segundos),
+                        Status="Concluído",
+                        Data=data_dia,
+                        Operador=st.session_state['usuario']
+                    )
                     salvar_registro(novo_registro)
                     
                     st.session_state['ronda_ativa'] = False
                     st.session_state['inicio_ronda'] = None
+                    st.session_state['inicio_ronda_mono'] = None
                     show_success_message(f"Ronda {st.session_state['contador_rondas_voo']} registrada!")
                     safe_rerun()
 
@@ -890,17 +1273,17 @@ def main():
                         if motivo:
                             st.session_state['contador_rondas_voo'] += 1
                             agora = datetime.now(FUSO_BR)
-                            novo_registro = {
-                                "Voo": f"{st.session_state['numero_voo_atual']:02d}",
-                                "Ronda_N": st.session_state['contador_rondas_voo'],
-                                "Ronda": ronda,
-                                "Inicio": "--:--:--",
-                                "Fim": "--:--:--",
-                                "Duracao_Formatada": "00:00:00",
-                                "Status": f"Justificado: {motivo}",
-                                "Data": agora.strftime("%d/%m/%Y"),
-                                "Operador": st.session_state['usuario']
-                            }
+                            novo_registro = Registro(
+                                Voo=st.session_state['numero_voo_atual_str'],
+                                Ronda_N=st.session_state['contador_rondas_voo'],
+                                Ronda=ronda,
+                                Inicio="--:--:--",
+                                Fim="--:--:--",
+                                Duracao_Formatada="00:00:00",
+                                Status=f"Justificado: {motivo}",
+                                Data=f"{agora:%d/%m/%Y}",
+                                Operador=st.session_state['usuario']
+                            )
                             salvar_registro(novo_registro)
                             show_success_message("Justificativa salva.")
                             safe_rerun()
@@ -922,50 +1305,52 @@ def main():
                         inicio = st.session_state['inicio_evento']
                         duracao_segundos = (fim - inicio).total_seconds()
                         st.session_state['contador_rondas_voo'] += 1
-                        
-                        novo_registro = {
-                            "Voo": f"{st.session_state['numero_voo_atual']:02d}",
-                            "Ronda_N": st.session_state['contador_rondas_voo'],
-                            "Ronda": "EVENTO OPERACIONAL",
-                            "Inicio": inicio.strftime("%H:%M:%S"),
-                            "Fim": fim.strftime("%H:%M:%S"),
-                            "Duracao_Formatada": formatar_duracao(duracao_segundos),
-                            "Status": st.session_state['tipo_evento_atual'],
-                            "Data": inicio.strftime("%d/%m/%Y"),
-                            "Operador": st.session_state['usuario']
-                        }
+
+                        hms_inicio = f"{inicio:%H:%M:%S}"
+                        hms_fim = f"{fim:%H:%M:%S}"
+                        data_dia = f"{inicio:%d/%m/%Y}"
+                        novo_registro = Registro(
+                            Voo=st.session_state['numero_voo_atual_str'],
+                            Ronda_N=st.session_state['contador_rondas_voo'],
+                            Ronda="EVENTO OPERACIONAL",
+                            Inicio=hms_inicio,
+                            Fim=hms_fim,
+                            Duracao_Formatada=formatar_duracao(duracao_segundos),
+                            Status=st.session_state['tipo_evento_atual'],
+                            Data=data_dia,
+                            Operador=st.session_state['usuario']
+                        )
                         salvar_registro(novo_registro)
                         st.session_state['evento_ativo'] = False
                         st.session_state['inicio_evento'] = None
+                        st.session_state['inicio_evento_mono'] = None
                         st.session_state['tipo_evento_atual'] = None
                         show_success_message("Evento registrado!")
                         safe_rerun()
 
-                    if hasattr(st, "fragment"):
-                        exibir_cronometro_evento()
-                    else:
-                        agora = datetime.now(FUSO_BR)
-                        delta_segundos = (agora - st.session_state['inicio_evento']).total_seconds()
-                        st.metric(label="Duração do Evento", value=formatar_duracao(delta_segundos))
-                        time.sleep(1)
-                        safe_rerun()
+                    exibir_cronometro_js(
+                        time.monotonic() - st.session_state['inicio_evento_mono'],
+                        "Duração do Evento"
+                    )
                 else:
                     if col_ev1.button("🔋 Iniciar Troca de Bateria", use_container_width=True, disabled=st.session_state['ronda_ativa']):
                         st.session_state['evento_ativo'] = True
                         st.session_state['tipo_evento_atual'] = "Troca de Bateria"
                         st.session_state['inicio_evento'] = datetime.now(FUSO_BR)
+                        st.session_state['inicio_evento_mono'] = time.monotonic()
                         safe_rerun()
                     
                     if col_ev2.button("🍽️ Iniciar Intervalo Refeição", use_container_width=True, disabled=st.session_state['ronda_ativa']):
                         st.session_state['evento_ativo'] = True
                         st.session_state['tipo_evento_atual'] = "Intervalo Refeição"
                         st.session_state['inicio_evento'] = datetime.now(FUSO_BR)
+                        st.session_state['inicio_evento_mono'] = time.monotonic()
                         safe_rerun()
 
         with col_dir:
             st.subheader("Status Atual")
             if st.session_state['voo_ativo']:
-                st.info(f"✈️ VOO ATUAL: {st.session_state['numero_voo_atual']:02d}")
+                st.info(f"✈️ VOO ATUAL: {st.session_state['numero_voo_atual_str']}")
                 st.metric("Rondas neste Voo", st.session_state['contador_rondas_voo'])
 
                 if st.session_state['ronda_ativa']:
@@ -975,22 +1360,13 @@ def main():
                     # Controle de atualização
                     auto_refresh = st.checkbox("⏱️ Atualização Automática", value=True, key="chk_auto_refresh")
 
-                    if hasattr(st, "fragment"):
-                        if auto_refresh:
-                            exibir_cronometro_ativo()
-                        else:
-                            exibir_cronometro_estatico()
+                    if auto_refresh:
+                        exibir_cronometro_js(
+                            time.monotonic() - st.session_state['inicio_ronda_mono'],
+                            "Tempo da Ronda"
+                        )
                     else:
-                        # Fallback para versões antigas do Streamlit
-                        agora = datetime.now(FUSO_BR)
-                        delta_segundos = (agora - st.session_state['inicio_ronda']).total_seconds()
-                        st.metric(label="Tempo da Ronda", value=formatar_duracao(delta_segundos))
-                        
-                        if auto_refresh:
-                            time.sleep(1)
-                            safe_rerun()
-                        elif st.button("🔄 Atualizar Manualmente"):
-                            safe_rerun()
+                        exibir_cronometro_estatico()
                 else:
                     st.success("🟢 Aguardando nova ronda...")
                     st.metric(label="Tempo da Ronda", value="0:00:00")
@@ -1000,10 +1376,10 @@ def main():
         # Tabela Recente
         st.divider()
         st.subheader("Registros Recentes")
-        df = carregar_dados()
-        if not df.empty:
-            # Mostrar os últimos 10, invertido
-            st.dataframe(df.tail(10).iloc[::-1])
+        # Últimos 10 direto do banco, já na ordem mais recente primeiro
+        df_recentes = carregar_ultimos(_db_mtime())
+        if not df_recentes.empty:
+            st.dataframe(df_recentes)
 
     # --- Lógica do Dashboard ---
     elif menu == "Dashboard / Relatórios":